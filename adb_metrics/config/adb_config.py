@@ -1,21 +1,44 @@
 #!/usr/bin/env python3
 
+import logging
 import subprocess
-from typing import List, Optional
+import threading
+import time
+from typing import Iterator, List, Optional
 
-from adb_metrics.config.config import config
+from adb_metrics.config.config import get_config
+from adb_metrics.device.device_health import device_health, DEFAULT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# stderr prefixes of ADB errors that mean the device itself is unreachable
+ADB_DEVICE_ERRORS = ("error: device", "error: closed")
+
+
+class ADBCommandError(Exception):
+    pass
 
 
 class ADBConfig:
     def __init__(self):
-        self.host = config.adb_host
-        self.port = config.adb_port
+        # CLI overrides; anything not overridden is read from the configuration on first use,
+        # so importing this module does not load .env
+        self._host: Optional[str] = None
+        self._port: Optional[int] = None
+
+    @property
+    def host(self) -> Optional[str]:
+        return self._host if self._host is not None else get_config().adb_host
+
+    @property
+    def port(self) -> Optional[int]:
+        return self._port if self._port is not None else get_config().adb_port
 
     def update_config(self, host: str = None, port: int = None):
         if host is not None:
-            self.host = host
+            self._host = host
         if port is not None:
-            self.port = port
+            self._port = port
 
     def build_adb_command(self, device_serial: str = None) -> List[str]:
         # ADB should be available in PATH
@@ -32,17 +55,109 @@ class ADBConfig:
 
         return cmd
 
-    def run_adb_command(self, command: str, device_serial: str = None, timeout: int = 30) -> Optional[str]:
+    @staticmethod
+    def _resolve_timeout(device_serial: Optional[str], timeout: Optional[float]) -> float:
+        if timeout is not None:
+            return timeout
+        if device_serial:
+            return device_health.get_timeout(device_serial)
+        return DEFAULT_TIMEOUT
+
+    def run_adb_command(self, command: str, device_serial: str = None,
+                        timeout: Optional[float] = None) -> Optional[str]:
+        """Run an ADB command and return its stdout, or None if it failed.
+
+        Without an explicit timeout, device commands use the timeout learned from that
+        device's recent latency, and their outcome feeds the device circuit breaker.
+        """
+        timeout = self._resolve_timeout(device_serial, timeout)
+        start = time.monotonic()
         try:
             base_cmd = self.build_adb_command(device_serial)
             result = subprocess.run(base_cmd + command.split(), capture_output=True, text=True, timeout=timeout)
-            return result.stdout if result.returncode == 0 else None
+        except subprocess.TimeoutExpired:
+            logger.error(f"ADB command '{command}' timed out after {timeout:.1f}s")
+            if device_serial:
+                device_health.record_failure(device_serial)
+            return None
         except Exception as e:
-            from logging import getLogger
-            logger = getLogger(__name__)
             logger.error(f"Error running ADB command '{command}': {e}")
             return None
 
+        if device_serial:
+            if result.returncode != 0 and result.stderr.startswith(ADB_DEVICE_ERRORS):
+                device_health.record_failure(device_serial)
+            else:
+                device_health.record_success(device_serial, time.monotonic() - start)
+
+        return result.stdout if result.returncode == 0 else None
+
+    def stream_adb_command(self, command: str, device_serial: str = None,
+                           timeout: Optional[float] = None) -> Iterator[str]:
+        """Yield stdout lines of an ADB command as they are produced.
+
+        Closing the generator before the output is exhausted terminates the command,
+        so parsers that only need the first few lines never read the rest.
+
+        Raises ADBCommandError if the command cannot be started, times out, or exits with a non-zero
+        status, so callers discard what they parsed from it, like run_adb_command returning None.
+        """
+        timeout = self._resolve_timeout(device_serial, timeout)
+        start = time.monotonic()
+        try:
+            base_cmd = self.build_adb_command(device_serial)
+            # stderr is read once stdout is exhausted, ADB only writes short error messages to it
+            process = subprocess.Popen(
+                base_cmd + command.split(),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+        except Exception as e:
+            logger.error(f"Error running ADB command '{command}': {e}")
+            raise ADBCommandError(f"ADB command '{command}' could not be started: {e}") from e
+
+        # Reading stdout blocks, so the timeout is enforced by killing the process
+        timed_out = threading.Event()
+
+        def kill_on_timeout():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, kill_on_timeout)
+        timer.start()
+        completed = False
+        try:
+            for line in process.stdout:
+                yield line.rstrip('\n')
+            completed = True
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            process.wait()
+
+            if timed_out.is_set():
+                logger.error(f"ADB command '{command}' timed out after {timeout:.1f}s")
+            if device_serial:
+                if timed_out.is_set() or (process.returncode != 0 and stderr.startswith(ADB_DEVICE_ERRORS)):
+                    device_health.record_failure(device_serial)
+                elif completed:
+                    device_health.record_success(device_serial, time.monotonic() - start)
+                else:
+                    # Closed early, the partial duration would pull the learned timeout down
+                    device_health.record_success(device_serial)
+
+        # Only reached when the output was read to the end, a generator closed early stops at the finally block
+        if timed_out.is_set():
+            raise ADBCommandError(f"ADB command '{command}' timed out after {timeout:.1f}s")
+        if process.returncode != 0:
+            logger.warning(f"ADB command '{command}' failed with exit code {process.returncode}: {stderr.strip()}")
+            raise ADBCommandError(f"ADB command '{command}' failed with exit code {process.returncode}")
+
 
 # Global ADB configuration instance
 adb_config = ADBConfig()
@@ -5,10 +5,6 @@ import sys
 from dataclasses import dataclass
 from typing import Optional
 
-from dotenv import load_dotenv
-
-load_dotenv()
-
 
 class ConfigurationError(Exception):
     pass
@@ -20,7 +16,7 @@ class Config:
     adb_host: Optional[str] = None
     adb_port: Optional[int] = None
 
-    # InfluxDB Configuration (required)
+    # InfluxDB Configuration (required for modes that write to InfluxDB)
     influxdb_url: str = None
     influxdb_token: str = None
     influxdb_org: str = None
@@ -31,21 +27,25 @@ class Config:
         self.adb_host = self._get_optional_env('ADB_HOST')
         self.adb_port = self._get_optional_int_env('ADB_PORT')
 
-        # Load InfluxDB Configuration (required)
-        self.influxdb_url = self._get_required_env('INFLUXDB_URL')
-        self.influxdb_token = self._get_required_env('INFLUXDB_TOKEN')
-        self.influxdb_org = self._get_required_env('INFLUXDB_ORG')
-        self.influxdb_bucket = self._get_required_env('INFLUXDB_BUCKET')
-
-    @staticmethod
-    def _get_required_env(key: str) -> str:
-        value = os.getenv(key)
-        if not value or value.strip() == "":
-            raise ConfigurationError(
-                f"Required environment variable '{key}' is missing or empty. "
-                f"Please set it in your .env file or environment."
-            )
-        return value.strip()
+        # Load InfluxDB Configuration (validated only when InfluxDB is used)
+        self.influxdb_url = self._get_optional_env('INFLUXDB_URL')
+        self.influxdb_token = self._get_optional_env('INFLUXDB_TOKEN')
+        self.influxdb_org = self._get_optional_env('INFLUXDB_ORG')
+        self.influxdb_bucket = self._get_optional_env('INFLUXDB_BUCKET')
+
+    def validate_influxdb(self):
+        required = {
+            'INFLUXDB_URL': self.influxdb_url,
+            'INFLUXDB_TOKEN': self.influxdb_token,
+            'INFLUXDB_ORG': self.influxdb_org,
+            'INFLUXDB_BUCKET': self.influxdb_bucket,
+        }
+        for key, value in required.items():
+            if value is None:
+                raise ConfigurationError(
+                    f"Required environment variable '{key}' is missing or empty. "
+                    f"Please set it in your .env file or environment."
+                )
 
     @staticmethod
     def _get_optional_env(key: str) -> Optional[str]:
@@ -85,22 +85,51 @@ class Config:
         )
 
 
-def load_config() -> Config:
+def _exit_with_configuration_error(error: ConfigurationError):
+    print(f"❌ Configuration Error: {error}", file=sys.stderr)
+    print("\n📝 Required environment variables (for InfluxDB persistence):", file=sys.stderr)
+    print("   - INFLUXDB_URL", file=sys.stderr)
+    print("   - INFLUXDB_TOKEN", file=sys.stderr)
+    print("   - INFLUXDB_ORG", file=sys.stderr)
+    print("   - INFLUXDB_BUCKET", file=sys.stderr)
+    print("\n📝 Optional environment variables:", file=sys.stderr)
+    print("   - ADB_HOST (for remote ADB)", file=sys.stderr)
+    print("   - ADB_PORT (for remote ADB)", file=sys.stderr)
+    print("\n💡 Create a .env file with these variables or set them in your environment.", file=sys.stderr)
+    sys.exit(1)
+
+
+def load_config(require_influxdb: bool = True) -> Config:
     try:
-        return Config()
+        # Imported here so that importing this module stays cheap
+        from dotenv import load_dotenv
+        load_dotenv()
+
+        loaded_config = Config()
+        if require_influxdb:
+            loaded_config.validate_influxdb()
+        return loaded_config
     except ConfigurationError as e:
-        print(f"❌ Configuration Error: {e}", file=sys.stderr)
-        print("\n📝 Required environment variables:", file=sys.stderr)
-        print("   - INFLUXDB_URL", file=sys.stderr)
-        print("   - INFLUXDB_TOKEN", file=sys.stderr)
-        print("   - INFLUXDB_ORG", file=sys.stderr)
-        print("   - INFLUXDB_BUCKET", file=sys.stderr)
-        print("\n📝 Optional environment variables:", file=sys.stderr)
-        print("   - ADB_HOST (for remote ADB)", file=sys.stderr)
-        print("   - ADB_PORT (for remote ADB)", file=sys.stderr)
-        print("\n💡 Create a .env file with these variables or set them in your environment.", file=sys.stderr)
-        sys.exit(1)
-
-
-# Global configuration instance - will exit if config is invalid
-config = load_config()
+        _exit_with_configuration_error(e)
+
+
+# Global configuration instance, loaded on first use
+_config: Optional[Config] = None
+
+
+def get_config(require_influxdb: bool = False) -> Config:
+    """Return the global configuration, loading it on first use - will exit if config is invalid.
+
+    Only modes that write to InfluxDB require its settings, the others run without them.
+    """
+    global _config
+    if _config is None:
+        _config = load_config(require_influxdb=False)
+
+    if require_influxdb:
+        try:
+            _config.validate_influxdb()
+        except ConfigurationError as e:
+            _exit_with_configuration_error(e)
+
+    return _config
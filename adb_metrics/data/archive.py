@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Dict, Iterator, List, Tuple
+
+from adb_metrics.device.android_metrics_collector import MetricPoint
+
+logger = logging.getLogger(__name__)
+
+# Archive layout:
+#   MAGIC, then any number of chunks appended over time.
+#   Chunk: <uint32 big-endian length> <zlib-compressed payload>
+#   Payload: <uint32 big-endian index length> <JSON index> <column data>
+#     The index lists the series in the chunk as [measurement, tags, field, type, count], type is "i" or "f".
+#     Column data holds, for each series in index order, `count` int64 timestamps (microseconds since the
+#     epoch, delta-encoded) followed by `count` values (int64 delta-encoded, or raw float64), little-endian.
+#     A series keeps the type of its first sample in every chunk, as InfluxDB fixes the type of a field.
+MAGIC = b"ADBMARC1"
+LENGTH = struct.Struct(">I")
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+DEFAULT_CHUNK_SAMPLES = 100_000
+DEFAULT_FLUSH_INTERVAL = 300
+
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...], str]
+
+
+def _to_bytes(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_bytes(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _delta_encode(values: List[int]) -> array:
+    return array("q", [current - previous for previous, current in zip([0] + values[:-1], values)])
+
+
+def _delta_decode(column: array) -> List[int]:
+    return list(accumulate(column))
+
+
+def _read_index(chunk: bytes) -> list:
+    """Decompress only as much of a chunk as needed to read its index"""
+    decompressor = zlib.decompressobj()
+    (index_length,) = LENGTH.unpack(decompressor.decompress(chunk, LENGTH.size))
+    return json.loads(decompressor.decompress(decompressor.unconsumed_tail, index_length))
+
+
+def _escape(value: str, *characters: str) -> str:
+    for character in characters:
+        value = value.replace(character, f"\\{character}")
+    return value
+
+
+@dataclass
+class SeriesSummary:
+    measurement: str
+    tags: Dict[str, str]
+    field: str
+    count: int
+    first: datetime
+    last: datetime
+    minimum: float
+    maximum: float
+    mean: float
+
+
+class ArchiveWriter:
+    """Appends collected metrics to a compact columnar archive file.
+
+    Samples are buffered per series and written as one compressed chunk once enough samples are buffered,
+    the flush interval has passed, or the writer is closed. Has the same interface as InfluxDBPersistence.
+    """
+
+    def __init__(self, path: str, chunk_samples: int = DEFAULT_CHUNK_SAMPLES,
+                 flush_interval: int = DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.chunk_samples = chunk_samples
+        self.flush_interval = flush_interval
+
+        self.series: Dict[SeriesKey, Tuple[List[int], list]] = {}
+        self.series_types: Dict[SeriesKey, str] = {}
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            end = self._scan_chunks()
+            self.file = open(path, "ab")
+            if end < os.path.getsize(path):
+                # A chunk was cut short by a crash during flush, chunks appended after it would never be read
+                logger.warning(f"Dropping incomplete chunk at the end of {path}")
+                self.file.truncate(end)
+        else:
+            self.file = open(path, "ab")
+            self.file.write(MAGIC)
+            self.file.flush()
+
+        self.buffered_samples = 0
+        self.last_flush = time.monotonic()
+        logger.info(f"Recording metrics to {path}")
+
+    def _scan_chunks(self) -> int:
+        """Learn the series types of an existing archive, return where its last complete chunk ends"""
+        with open(self.path, "rb") as archive:
+            if archive.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a metrics archive")
+
+            end = archive.tell()
+            while True:
+                header = archive.read(LENGTH.size)
+                if len(header) < LENGTH.size:
+                    break
+                (chunk_length,) = LENGTH.unpack(header)
+                chunk = archive.read(chunk_length)
+                if len(chunk) < chunk_length:
+                    break
+                try:
+                    index = _read_index(chunk)
+                except (zlib.error, struct.error, ValueError):
+                    break
+
+                for measurement, tags, field, value_type, _ in index:
+                    self.series_types.setdefault((measurement, tuple(sorted(tags.items())), field), value_type)
+                end = archive.tell()
+
+        return end
+
+    def write_metrics(self, metrics: List[MetricPoint]) -> bool:
+        try:
+            for metric in metrics:
+                timestamp_us = (metric.timestamp - EPOCH) // timedelta(microseconds=1)
+                tags = tuple(sorted(metric.tags.items()))
+                for field, value in metric.fields.items():
+                    key = (metric.measurement, tags, field)
+                    if key not in self.series:
+                        self.series[key] = ([], [])
+                    timestamps, values = self.series[key]
+                    timestamps.append(timestamp_us)
+                    values.append(value)
+                    self.buffered_samples += 1
+
+            if (self.buffered_samples >= self.chunk_samples
+                    or time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush()
+            return True
+        except Exception as e:
+            logger.error(f"Error writing to archive {self.path}: {e}")
+            return False
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.series:
+            return
+
+        index = []
+        columns = []
+        for (measurement, tags, field), (timestamps, values) in self.series.items():
+            value_type = self.series_types.get((measurement, tags, field))
+            if value_type is None:
+                value_type = "i" if isinstance(values[0], int) else "f"
+                self.series_types[(measurement, tags, field)] = value_type
+
+            if value_type == "i":
+                value_column = _delta_encode([round(value) for value in values])
+            else:
+                value_column = array("d", [float(value) for value in values])
+
+            index.append([measurement, dict(tags), field, value_type, len(timestamps)])
+            columns.append(_to_bytes(_delta_encode(timestamps)))
+            columns.append(_to_bytes(value_column))
+
+        index_bytes = json.dumps(index, separators=(",", ":")).encode()
+        chunk = zlib.compress(LENGTH.pack(len(index_bytes)) + index_bytes + b"".join(columns))
+
+        self.file.write(LENGTH.pack(len(chunk)) + chunk)
+        self.file.flush()
+        logger.info(f"Wrote chunk of {self.buffered_samples} samples ({len(chunk)} bytes) to {self.path}")
+
+        self.series = {}
+        self.buffered_samples = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class ArchiveReader:
+    def __init__(self, path: str):
+        self.path = path
+
+    def iter_series(self) -> Iterator[Tuple[str, Dict[str, str], str, List[int], list]]:
+        """Yield (measurement, tags, field, timestamps_us, values) for every series of every chunk"""
+        with open(self.path, "rb") as archive:
+            if archive.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a metrics archive")
+
+            while True:
+                header = archive.read(LENGTH.size)
+                if len(header) < LENGTH.size:
+                    break
+                (chunk_length,) = LENGTH.unpack(header)
+                chunk = archive.read(chunk_length)
+                if len(chunk) < chunk_length:
+                    logger.warning(f"Ignoring truncated chunk at the end of {self.path}")
+                    break
+
+                payload = zlib.decompress(chunk)
+                (index_length,) = LENGTH.unpack_from(payload)
+                offset = LENGTH.size + index_length
+                index = json.loads(payload[LENGTH.size:offset])
+
+                for measurement, tags, field, value_type, count in index:
+                    size = count * 8
+                    timestamps = _delta_decode(_from_bytes("q", payload[offset:offset + size]))
+                    offset += size
+                    if value_type == "i":
+                        values = _delta_decode(_from_bytes("q", payload[offset:offset + size]))
+                    else:
+                        values = _from_bytes("d", payload[offset:offset + size]).tolist()
+                    offset += size
+
+                    yield measurement, tags, field, timestamps, values
+
+    def iter_line_protocol(self, batch_size: int) -> Iterator[List[str]]:
+        """Yield batches of InfluxDB line protocol records with microsecond timestamps"""
+        batch = []
+        for measurement, tags, field, timestamps, values in self.iter_series():
+            series = _escape(measurement, ",", " ")
+            for tag_key, tag_value in sorted(tags.items()):
+                series += f",{_escape(tag_key, ',', '=', ' ')}={_escape(tag_value, ',', '=', ' ')}"
+            series += f" {_escape(field, ',', '=', ' ')}="
+
+            suffix = "i " if values and isinstance(values[0], int) else " "
+            batch.extend(f"{series}{value}{suffix}{timestamp}" for timestamp, value in zip(timestamps, values))
+
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    def summarize(self) -> List[SeriesSummary]:
+        totals: Dict[SeriesKey, list] = {}
+        for measurement, tags, field, timestamps, values in self.iter_series():
+            key = (measurement, tuple(sorted(tags.items())), field)
+            if key not in totals:
+                totals[key] = [0, timestamps[0], timestamps[-1], min(values), max(values), 0.0]
+            total = totals[key]
+            total[0] += len(values)
+            total[1] = min(total[1], timestamps[0])
+            total[2] = max(total[2], timestamps[-1])
+            total[3] = min(total[3], min(values))
+            total[4] = max(total[4], max(values))
+            total[5] += sum(values)
+
+        return [
+            SeriesSummary(
+                measurement=measurement,
+                tags=dict(tags),
+                field=field,
+                count=count,
+                first=EPOCH + timedelta(microseconds=first),
+                last=EPOCH + timedelta(microseconds=last),
+                minimum=minimum,
+                maximum=maximum,
+                mean=value_sum / count,
+            )
+            for (measurement, tags, field), (count, first, last, minimum, maximum, value_sum) in totals.items()
+        ]
+
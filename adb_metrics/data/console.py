@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+from typing import List, TYPE_CHECKING
+
+from adb_metrics.device.android_metrics_collector import MetricPoint
+
+if TYPE_CHECKING:
+    from adb_metrics.data.archive import SeriesSummary
+
+
+class ConsolePrinter:
+    @staticmethod
+    def print_metrics(metrics: List[MetricPoint]):
+        if not metrics:
+            print("No metrics collected")
+            return
+
+        print(f"\n=== Metrics Collection Report ({len(metrics)} points) ===")
+
+        # Group by measurement type
+        by_measurement = {}
+        for metric in metrics:
+            if metric.measurement not in by_measurement:
+                by_measurement[metric.measurement] = []
+            by_measurement[metric.measurement].append(metric)
+
+        for measurement, points in by_measurement.items():
+            print(f"\n📊 {measurement.upper()}:")
+            for point in points:
+                tags_str = ", ".join([f"{k}={v}" for k, v in point.tags.items()])
+                fields_str = ", ".join([f"{k}={v:.2f}" for k, v in point.fields.items()])
+                print(f"  [{tags_str}] {fields_str}")
+
+    @staticmethod
+    def print_archive_summary(summaries: List["SeriesSummary"]):
+        if not summaries:
+            print("Archive is empty")
+            return
+
+        total_samples = sum(summary.count for summary in summaries)
+        print(f"\n=== Archive Summary ({len(summaries)} series, {total_samples} samples) ===")
+        print(f"From {min(summary.first for summary in summaries)} to {max(summary.last for summary in summaries)}")
+
+        # Group by measurement type
+        by_measurement = {}
+        for summary in summaries:
+            if summary.measurement not in by_measurement:
+                by_measurement[summary.measurement] = []
+            by_measurement[summary.measurement].append(summary)
+
+        for measurement, series in by_measurement.items():
+            print(f"\n📊 {measurement.upper()}:")
+            for summary in sorted(series, key=lambda s: (sorted(s.tags.items()), s.field)):
+                tags_str = ", ".join([f"{k}={v}" for k, v in summary.tags.items()])
+                print(f"  [{tags_str}] {summary.field}: {summary.count} samples, "
+                      f"min={summary.minimum:.2f}, mean={summary.mean:.2f}, max={summary.maximum:.2f}")
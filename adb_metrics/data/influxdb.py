@@ -5,8 +5,9 @@ from typing import List
 
 from influxdb_client import InfluxDBClient, Point
 from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client.domain.write_precision import WritePrecision
 
-from adb_metrics.config.config import config
+from adb_metrics.config.config import get_config
 from adb_metrics.device.android_metrics_collector import MetricPoint
 
 logger = logging.getLogger(__name__)
@@ -14,7 +15,7 @@ logger = logging.getLogger(__name__)
 
 class InfluxDBPersistence:
     def __init__(self, custom_config: dict = None):
-        influx_config = custom_config or config.get_influxdb_config()
+        influx_config = custom_config or get_config(require_influxdb=True).get_influxdb_config()
 
         try:
             self.client = InfluxDBClient(
@@ -61,29 +62,14 @@ class InfluxDBPersistence:
             logger.error(f"Error writing to InfluxDB: {e}")
             return False
 
+    def write_line_protocol(self, records: List[str], precision: str = WritePrecision.US) -> bool:
+        try:
+            self.write_api.write(bucket=self.bucket, record=records, write_precision=precision)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing to InfluxDB: {e}")
+            return False
+
     def close(self):
         self.client.close()
 
-
-class ConsolePrinter:
-    @staticmethod
-    def print_metrics(metrics: List[MetricPoint]):
-        if not metrics:
-            print("No metrics collected")
-            return
-
-        print(f"\n=== Metrics Collection Report ({len(metrics)} points) ===")
-
-        # Group by measurement type
-        by_measurement = {}
-        for metric in metrics:
-            if metric.measurement not in by_measurement:
-                by_measurement[metric.measurement] = []
-            by_measurement[metric.measurement].append(metric)
-
-        for measurement, points in by_measurement.items():
-            print(f"\n📊 {measurement.upper()}:")
-            for point in points:
-                tags_str = ", ".join([f"{k}={v}" for k, v in point.tags.items()])
-                fields_str = ", ".join([f"{k}={v:.2f}" for k, v in point.fields.items()])
-                print(f"  [{tags_str}] {fields_str}")
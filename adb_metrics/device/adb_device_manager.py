@@ -4,7 +4,9 @@ import logging
 from typing import List, Dict, Optional
 
 from adb_metrics.config.adb_config import adb_config
-from adb_metrics.device.android_metrics_collector import AndroidMetricsCollector, MetricPoint
+from adb_metrics.device.android_metrics_collector import AndroidMetricsCollector, MetricPoint, COLLECTION_STAGES
+from adb_metrics.device.cardinality_guard import CardinalityGuard
+from adb_metrics.device.device_health import device_health, PROBE_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
@@ -49,24 +51,60 @@ class ADBDeviceManager:
         return info
 
     @staticmethod
-    def collect_from_all_devices(app_patterns: Optional[List[str]]) -> List[MetricPoint]:
+    def is_device_available(device_serial: str) -> bool:
+        if not device_health.is_degraded(device_serial):
+            return True
+
+        # Degraded devices only get a cheap probe once their backoff has elapsed
+        if not device_health.is_probe_due(device_serial):
+            return False
+
+        logger.info(f"Probing degraded device: {device_serial}")
+        adb_config.run_adb_command("shell echo ok", device_serial, timeout=PROBE_TIMEOUT)
+        return not device_health.is_degraded(device_serial)
+
+    @staticmethod
+    def collect_from_devices(devices: List[str], app_patterns: Optional[List[str]],
+                             deadline: Optional[float] = None,
+                             guard: Optional[CardinalityGuard] = None,
+                             frame_metrics: bool = False) -> List[MetricPoint]:
+        collectors = []
+        for device_serial in devices:
+            if ADBDeviceManager.is_device_available(device_serial):
+                collectors.append(AndroidMetricsCollector(device_serial, frame_metrics))
+            else:
+                logger.warning(f"Skipping degraded device: {device_serial}")
+
+        # Stage by stage across devices, so a late cycle sheds app metrics on every device
+        # before it sheds system metrics on any of them
+        all_metrics = []
+        for stage in COLLECTION_STAGES:
+            for collector in collectors:
+                all_metrics.extend(collector.collect_stage(stage, app_patterns, deadline))
+
+        if guard:
+            all_metrics = guard.apply(all_metrics)
+
+        return all_metrics
+
+    @staticmethod
+    def collect_from_all_devices(app_patterns: Optional[List[str]],
+                                 deadline: Optional[float] = None,
+                                 guard: Optional[CardinalityGuard] = None,
+                                 frame_metrics: bool = False) -> List[MetricPoint]:
         devices = ADBDeviceManager.get_connected_devices()
 
         if not devices:
             logger.warning("No devices connected")
             return []
 
-        all_metrics = []
         for device_serial in devices:
-            logger.info(f"Collecting from device: {device_serial}")
-            device_info = ADBDeviceManager.get_device_info(device_serial)
-            logger.info(f"Device info: {device_info}")
+            if not device_health.is_degraded(device_serial):
+                logger.info(f"Collecting from device: {device_serial}")
+                device_info = ADBDeviceManager.get_device_info(device_serial)
+                logger.info(f"Device info: {device_info}")
 
-            collector = AndroidMetricsCollector(device_serial)
-            metrics = collector.collect_all_metrics(app_patterns)
-            all_metrics.extend(metrics)
-
-        return all_metrics
+        return ADBDeviceManager.collect_from_devices(devices, app_patterns, deadline, guard, frame_metrics)
 
     @staticmethod
     def get_version() -> str:
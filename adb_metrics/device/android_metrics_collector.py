@@ -2,14 +2,23 @@
 
 import logging
 import re
+import time
+from contextlib import closing
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 
-from adb_metrics.config.adb_config import adb_config
+from adb_metrics.config.adb_config import adb_config, ADBCommandError
+from adb_metrics.device.device_health import device_health
+from adb_metrics.device.frame_stats import FramestatsParser
 
 logger = logging.getLogger(__name__)
 
+# Collection stages in priority order; when a cycle runs out of time the last ones are shed first
+COLLECTION_STAGES = ("temperature", "system", "apps")
+# Stages that check the deadline themselves as they go, they are only shed once the deadline has passed
+SELF_LIMITING_STAGES = ("apps",)
+
 
 @dataclass
 class MetricPoint:
@@ -20,8 +29,9 @@ class MetricPoint:
 
 
 class AndroidMetricsCollector:
-    def __init__(self, device_id: str = None):
+    def __init__(self, device_id: str = None, frame_metrics: bool = False):
         self.device_id = device_id
+        self.frame_metrics = frame_metrics
         self.device_serial = self._get_device_serial()
 
     def _get_device_serial(self) -> str:
@@ -43,20 +53,22 @@ class AndroidMetricsCollector:
     def run_adb_command(self, command: str) -> Optional[str]:
         return adb_config.run_adb_command(f"shell {command}", self.device_serial)
 
-    def get_installed_packages(self, pattern: str = None) -> List[str]:
-        output = self.run_adb_command("pm list packages")
-        if not output:
-            return []
+    def stream_adb_command(self, command: str) -> Iterator[str]:
+        return adb_config.stream_adb_command(f"shell {command}", self.device_serial)
 
+    def get_installed_packages(self, pattern: str = None) -> List[str]:
         packages = []
-        for line in output.strip().split('\n'):
-            if line.startswith('package:'):
-                package_name = line.replace('package:', '')
-                if pattern:
-                    if re.search(pattern.replace('*', '.*'), package_name):
+        try:
+            for line in self.stream_adb_command("pm list packages"):
+                if line.startswith('package:'):
+                    package_name = line.replace('package:', '').strip()
+                    if pattern:
+                        if re.search(pattern.replace('*', '.*'), package_name):
+                            packages.append(package_name)
+                    else:
                         packages.append(package_name)
-                else:
-                    packages.append(package_name)
+        except ADBCommandError:
+            return []
 
         return packages
 
@@ -66,31 +78,34 @@ class AndroidMetricsCollector:
         base_tags = {"device_serial": self.device_serial}
 
         # Battery temperature
-        battery_output = self.run_adb_command("dumpsys battery")
-        if battery_output:
-            temp_match = re.search(r"temperature: (\d+)", battery_output)
-            if temp_match:
-                battery_temp = int(temp_match.group(1)) / 10.0
-                points.append(
-                    MetricPoint(
-                        measurement="temperature",
-                        tags={**base_tags, "sensor": "battery"},
-                        fields={"value": battery_temp},
-                        timestamp=current_time,
-                    )
-                )
+        try:
+            with closing(self.stream_adb_command("dumpsys battery")) as battery_lines:
+                for line in battery_lines:
+                    temp_match = re.search(r"temperature: (\d+)", line)
+                    if temp_match:
+                        battery_temp = int(temp_match.group(1)) / 10.0
+                        points.append(
+                            MetricPoint(
+                                measurement="temperature",
+                                tags={**base_tags, "sensor": "battery"},
+                                fields={"value": battery_temp},
+                                timestamp=current_time,
+                            )
+                        )
+                        break
+        except ADBCommandError:
+            pass
 
         # Thermal zones
-        thermal_output = self.run_adb_command("dumpsys thermal")
-        if thermal_output:
-            thermal_lines = thermal_output.split("\n")
-            for line in thermal_lines:
+        thermal_points = []
+        try:
+            for line in self.stream_adb_command("dumpsys thermal"):
                 if "Temperature" in line and "mValue=" in line:
                     match = re.search(r"mType=(\w+).*mValue=([\d.]+)", line)
                     if match:
                         sensor_type = match.group(1)
                         temp_value = float(match.group(2))
-                        points.append(
+                        thermal_points.append(
                             MetricPoint(
                                 measurement="temperature",
                                 tags={**base_tags, "sensor": sensor_type},
@@ -98,19 +113,21 @@ class AndroidMetricsCollector:
                                 timestamp=current_time,
                             )
                         )
+        except ADBCommandError:
+            # Output of a failed dump may be incomplete
+            thermal_points = []
+        points.extend(thermal_points)
 
         return points
 
     def _parse_proc_stat(self) -> Optional[Dict[str, float]]:
         """Parse /proc/stat for CPU metrics"""
         try:
-            stat_output = self.run_adb_command("cat /proc/stat")
-            if not stat_output:
-                return None
+            # Only the first line, which contains overall CPU stats, is needed
+            with closing(self.stream_adb_command("cat /proc/stat")) as stat_lines:
+                first_line = next(stat_lines, None)
 
-            # Parse first line which contains overall CPU stats
-            first_line = stat_output.split('\n')[0]
-            if not first_line.startswith('cpu '):
+            if not first_line or not first_line.startswith('cpu '):
                 return None
 
             # Format: cpu user nice system idle iowait irq softirq steal guest guest_nice
@@ -139,6 +156,8 @@ class AndroidMetricsCollector:
                 "iowait_percent": (iowait / total) * 100,
                 "total_usage_percent": ((total - idle) / total) * 100
             }
+        except ADBCommandError:
+            return None
         except Exception as e:
             logger.error(f"Error parsing /proc/stat: {e}")
             return None
@@ -195,38 +214,44 @@ class AndroidMetricsCollector:
         base_tags = {"device_serial": self.device_serial}
 
         # Memory info
-        meminfo_output = self.run_adb_command("cat /proc/meminfo")
-        if meminfo_output:
+        mem_data = {}
+        try:
+            with closing(self.stream_adb_command("cat /proc/meminfo")) as meminfo_lines:
+                for line in meminfo_lines:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        value_kb = (
+                            int(re.findall(r"\d+", value)[0])
+                            if re.findall(r"\d+", value)
+                            else 0
+                        )
+                        mem_data[key.strip()] = value_kb * 1024
+
+                    # MemTotal and MemAvailable are at the top, the rest is not needed
+                    if "MemTotal" in mem_data and "MemAvailable" in mem_data:
+                        break
+        except ADBCommandError:
             mem_data = {}
-            for line in meminfo_output.split("\n"):
-                if ":" in line:
-                    key, value = line.split(":", 1)
-                    value_kb = (
-                        int(re.findall(r"\d+", value)[0])
-                        if re.findall(r"\d+", value)
-                        else 0
-                    )
-                    mem_data[key.strip()] = value_kb * 1024
 
-            if "MemTotal" in mem_data and "MemAvailable" in mem_data:
-                total_memory = mem_data["MemTotal"]
-                available_memory = mem_data["MemAvailable"]
-                used_memory = total_memory - available_memory
-                memory_usage_percent = (used_memory / total_memory) * 100
+        if "MemTotal" in mem_data and "MemAvailable" in mem_data:
+            total_memory = mem_data["MemTotal"]
+            available_memory = mem_data["MemAvailable"]
+            used_memory = total_memory - available_memory
+            memory_usage_percent = (used_memory / total_memory) * 100
 
-                points.append(
-                    MetricPoint(
-                        measurement="system_memory",
-                        tags=base_tags,
-                        fields={
-                            "total_bytes": total_memory,
-                            "used_bytes": used_memory,
-                            "available_bytes": available_memory,
-                            "usage_percent": memory_usage_percent,
-                        },
-                        timestamp=current_time,
-                    )
+            points.append(
+                MetricPoint(
+                    measurement="system_memory",
+                    tags=base_tags,
+                    fields={
+                        "total_bytes": total_memory,
+                        "used_bytes": used_memory,
+                        "available_bytes": available_memory,
+                        "usage_percent": memory_usage_percent,
+                    },
+                    timestamp=current_time,
                 )
+            )
 
         # CPU usage - try /proc/stat first, then top as fallback
         cpu_data = self._parse_proc_stat()
@@ -250,18 +275,16 @@ class AndroidMetricsCollector:
 
     def _get_app_cpu_from_dumpsys(self, package_name: str) -> Optional[float]:
         try:
-            cpuinfo_output = self.run_adb_command("dumpsys cpuinfo")
-            if not cpuinfo_output:
-                return None
-
-            lines = cpuinfo_output.split('\n')
-            for line in lines:
-                if package_name in line and '%' in line:
-                    # Extract percentage from line like: "12.3% 1234/com.microsoft.office.outlook: 8.9% user + 3.4% kernel"
-                    match = re.search(r'(\d+(?:\.\d+)?)%', line)
-                    if match:
-                        return float(match.group(1))
+            with closing(self.stream_adb_command("dumpsys cpuinfo")) as cpuinfo_lines:
+                for line in cpuinfo_lines:
+                    if package_name in line and '%' in line:
+                        # Extract percentage from line like: "12.3% 1234/com.microsoft.office.outlook: 8.9% user + 3.4% kernel"
+                        match = re.search(r'(\d+(?:\.\d+)?)%', line)
+                        if match:
+                            return float(match.group(1))
 
+            return None
+        except ADBCommandError:
             return None
         except Exception as e:
             logger.error(f"Error getting CPU from dumpsys for {package_name}: {e}")
@@ -305,12 +328,38 @@ class AndroidMetricsCollector:
             logger.error(f"Error getting CPU from top for {package_name}: {e}")
             return None
 
-    def collect_app_metrics(self, package_names: List[str]) -> List[MetricPoint]:
+    def _get_app_frame_stats(self, package_name: str) -> Optional[Dict[str, float]]:
+        try:
+            parser = FramestatsParser()
+            # "reset" empties the frame buffers in the same call that dumps them, so the next interval
+            # neither counts these frames again nor misses frames rendered in between
+            for line in self.stream_adb_command(f"dumpsys gfxinfo {package_name} framestats reset"):
+                parser.feed(line)
+
+            if parser.histogram.total_frames == 0:
+                return None
+            return parser.histogram.to_fields()
+        except ADBCommandError:
+            return None
+        except Exception as e:
+            logger.error(f"Error getting frame stats for {package_name}: {e}")
+            return None
+
+    def collect_app_metrics(self, package_names: List[str], deadline: Optional[float] = None) -> List[MetricPoint]:
         points = []
         current_time = datetime.now(timezone.utc)
         base_tags = {"device_serial": self.device_serial}
 
-        for package_name in package_names:
+        for index, package_name in enumerate(package_names):
+            if device_health.is_degraded(self.device_serial):
+                logger.warning(f"Device {self.device_serial} is degraded, skipping metrics for "
+                               f"{len(package_names) - index} apps")
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.warning(f"Cycle deadline reached, shedding metrics for "
+                               f"{len(package_names) - index} apps on {self.device_serial}")
+                break
+
             # Check if app is running
             ps_output = self.run_adb_command(f"ps | grep {package_name}")
             if not ps_output:
@@ -319,19 +368,24 @@ class AndroidMetricsCollector:
             app_tags = {**base_tags, "package_name": package_name}
 
             # Memory usage
-            meminfo_output = self.run_adb_command(f"dumpsys meminfo {package_name}")
-            if meminfo_output:
-                pss_match = re.search(r"TOTAL\s+(\d+)", meminfo_output)
-                if pss_match:
-                    pss_memory = int(pss_match.group(1)) * 1024
-                    points.append(
-                        MetricPoint(
-                            measurement="app_memory",
-                            tags=app_tags,
-                            fields={"pss_bytes": pss_memory},
-                            timestamp=current_time,
-                        )
-                    )
+            # Stop reading as soon as the TOTAL row shows up, the rest of the dump is not needed
+            try:
+                with closing(self.stream_adb_command(f"dumpsys meminfo {package_name}")) as meminfo_lines:
+                    for line in meminfo_lines:
+                        pss_match = re.search(r"TOTAL\s+(\d+)", line)
+                        if pss_match:
+                            pss_memory = int(pss_match.group(1)) * 1024
+                            points.append(
+                                MetricPoint(
+                                    measurement="app_memory",
+                                    tags=app_tags,
+                                    fields={"pss_bytes": pss_memory},
+                                    timestamp=current_time,
+                                )
+                            )
+                            break
+            except ADBCommandError:
+                pass
 
             # CPU usage - try dumpsys first, then top as fallback
             cpu_usage = self._get_app_cpu_from_dumpsys(package_name)
@@ -348,20 +402,23 @@ class AndroidMetricsCollector:
                     )
                 )
 
-        return points
-
-    def collect_all_metrics(self, app_patterns: Optional[List[str]]) -> List[MetricPoint]:
-        all_points = []
-
-        logger.info(f"Collecting metrics for device: {self.device_serial}")
-
-        # Temperature metrics
-        all_points.extend(self.collect_temperature_metrics())
+            # Frame timing
+            if self.frame_metrics:
+                frame_stats = self._get_app_frame_stats(package_name)
+                if frame_stats:
+                    points.append(
+                        MetricPoint(
+                            measurement="app_frames",
+                            tags=app_tags,
+                            fields=frame_stats,
+                            timestamp=current_time,
+                        )
+                    )
 
-        # Global system metrics
-        all_points.extend(self.collect_global_system_metrics())
+        return points
 
-        # App-specific metrics
+    def collect_pattern_app_metrics(self, app_patterns: Optional[List[str]],
+                                    deadline: Optional[float] = None) -> List[MetricPoint]:
         if app_patterns:
             logger.info(f"Collecting metrics for app patterns: {app_patterns}")
             all_app_packages = []
@@ -376,8 +433,48 @@ class AndroidMetricsCollector:
 
             if all_app_packages:
                 logger.info(f"Collecting metrics for {len(all_app_packages)} unique apps")
-                all_points.extend(self.collect_app_metrics(all_app_packages))
+                return self.collect_app_metrics(all_app_packages, deadline)
         else:
             logger.info("No app patterns specified, only collecting global metrics")
 
+        return []
+
+    def collect_stage(self, stage: str, app_patterns: Optional[List[str]],
+                      deadline: Optional[float] = None) -> List[MetricPoint]:
+        """Collect one stage, or nothing if it is not expected to finish before the deadline"""
+        # The device may have tripped the breaker in an earlier stage of this cycle
+        if device_health.is_degraded(self.device_serial):
+            logger.warning(f"Skipping {stage} metrics for degraded device {self.device_serial}")
+            return []
+
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            estimate = 0.0 if stage in SELF_LIMITING_STAGES else device_health.get_stage_estimate(
+                self.device_serial, stage)
+            if remaining <= 0 or remaining < estimate:
+                logger.warning(f"Shedding {stage} metrics for {self.device_serial}: "
+                               f"only {max(0.0, remaining):.1f}s left in this cycle")
+                device_health.record_stage_shed(self.device_serial, stage)
+                return []
+
+        start = time.monotonic()
+        if stage == "temperature":
+            points = self.collect_temperature_metrics()
+        elif stage == "system":
+            points = self.collect_global_system_metrics()
+        else:
+            points = self.collect_pattern_app_metrics(app_patterns, deadline)
+        device_health.record_stage_duration(self.device_serial, stage, time.monotonic() - start)
+
+        return points
+
+    def collect_all_metrics(self, app_patterns: Optional[List[str]],
+                            deadline: Optional[float] = None) -> List[MetricPoint]:
+        all_points = []
+
+        logger.info(f"Collecting metrics for device: {self.device_serial}")
+
+        for stage in COLLECTION_STAGES:
+            all_points.extend(self.collect_stage(stage, app_patterns, deadline))
+
         return all_points
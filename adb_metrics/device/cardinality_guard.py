@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+import logging
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from adb_metrics.device.android_metrics_collector import MetricPoint
+
+logger = logging.getLogger(__name__)
+
+# Measurements whose series count grows with the device: the tag that tells the series apart,
+# the field that ranks how active a series is, and how the fields of folded series are combined
+FOLDABLE_MEASUREMENTS: Dict[str, Tuple[str, str, Callable]] = {
+    "temperature": ("sensor", "value", max),
+    "app_cpu": ("package_name", "usage_percent", sum),
+    "app_memory": ("package_name", "pss_bytes", sum),
+    "app_frames": ("package_name", "total_frames", max),
+}
+
+# Fields combined differently from the rest of their measurement when series are folded
+FIELD_COMBINERS: Dict[str, Callable] = {
+    "total_frames": sum,
+    "janky_frames": sum,
+}
+
+# Fields derived from other fields of the same point, recomputed from the combined fields of folded series
+DERIVED_FIELDS: Dict[str, Callable[[Dict[str, float]], float]] = {
+    "janky_percent": lambda fields: (fields["janky_frames"] / fields["total_frames"]) * 100,
+}
+
+# Series that are always kept on top of the budget, the dashboard relies on them
+PINNED_SERIES: Dict[str, Tuple[str, ...]] = {
+    "temperature": ("battery",),
+}
+
+OTHER_SERIES = "other"
+
+# Activity is smoothed across cycles so the kept series do not flip on every small change
+ACTIVITY_SMOOTHING = 0.3
+# A newcomer only takes the slot of the least active kept series when it is this many times more active,
+# for this many cycles in a row
+ADMISSION_MARGIN = 2.0
+ADMISSION_CYCLES = 20
+# Kept series not reported for this many cycles give up their slot
+IDLE_CYCLES = 10
+# Series not seen for this many cycles are forgotten
+STALE_CYCLES = 120
+
+
+class CardinalityGuard:
+    """Keeps the number of series per device and measurement within a budget.
+
+    Series are admitted to the budget's slots as they show up and keep their slot until they go idle or a
+    clearly more active series takes it, so the number of series written over time stays bounded as well.
+    Series without a slot are folded into a single "other" series, which takes the last slot of the budget.
+    A "cardinality" point records how many series were folded.
+    """
+
+    def __init__(self, default_budget: Optional[int] = None, measurement_budgets: Optional[Dict[str, int]] = None):
+        self.default_budget = default_budget
+        self.measurement_budgets = measurement_budgets or {}
+        self.activity: Dict[Tuple[str, str, str], float] = {}
+        self.last_seen: Dict[Tuple[str, str, str], int] = {}
+        self.slots: Dict[Tuple[str, str], Set[str]] = {}
+        self.challenges: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self.cycle = 0
+
+    def get_budget(self, measurement: str) -> Optional[int]:
+        return self.measurement_budgets.get(measurement, self.default_budget)
+
+    def _update_activity(self, key: Tuple[str, str, str], value: float) -> float:
+        previous = self.activity.get(key)
+        activity = value if previous is None else ACTIVITY_SMOOTHING * value + (1 - ACTIVITY_SMOOTHING) * previous
+        self.activity[key] = activity
+        self.last_seen[key] = self.cycle
+        return activity
+
+    def _forget_stale_series(self):
+        stale = [key for key, seen in self.last_seen.items() if self.cycle - seen > STALE_CYCLES]
+        for key in stale:
+            del self.activity[key]
+            del self.last_seen[key]
+            self.challenges.get(key[:2], {}).pop(key[2], None)
+            self.slots.get(key[:2], set()).discard(key[2])
+
+    def apply(self, metrics: List[MetricPoint]) -> List[MetricPoint]:
+        self.cycle += 1
+
+        guarded = []
+        groups: Dict[Tuple[str, str], List[MetricPoint]] = {}
+        for metric in metrics:
+            if metric.measurement in FOLDABLE_MEASUREMENTS and self.get_budget(metric.measurement) is not None:
+                group_key = (metric.tags.get("device_serial", "unknown"), metric.measurement)
+                if group_key not in groups:
+                    groups[group_key] = []
+                groups[group_key].append(metric)
+            else:
+                guarded.append(metric)
+
+        for (device_serial, measurement), points in groups.items():
+            guarded.extend(self._fold_group(device_serial, measurement, points))
+
+        self._forget_stale_series()
+        return guarded
+
+    def _fold_group(self, device_serial: str, measurement: str, points: List[MetricPoint]) -> List[MetricPoint]:
+        series_tag, activity_field, combine = FOLDABLE_MEASUREMENTS[measurement]
+        pinned = PINNED_SERIES.get(measurement, ())
+        slots = self.slots.setdefault((device_serial, measurement), set())
+        challenges = self.challenges.setdefault((device_serial, measurement), {})
+        capacity = self.get_budget(measurement) - 1
+
+        # Kept series that stopped reporting free their slot
+        for name in list(slots):
+            if self.cycle - self.last_seen.get((device_serial, measurement, name), 0) > IDLE_CYCLES:
+                slots.discard(name)
+
+        # A challenge counts cycles in a row, it ends when the challenger is not reported
+        reported = {point.tags.get(series_tag, "") for point in points}
+        for name in [name for name in challenges if name not in reported]:
+            del challenges[name]
+
+        kept = []
+        newcomers = []
+        for point in points:
+            name = point.tags.get(series_tag, "")
+            activity = self._update_activity((device_serial, measurement, name),
+                                             float(point.fields.get(activity_field, 0)))
+            if name in pinned or name in slots:
+                kept.append(point)
+            else:
+                newcomers.append((activity, name, point))
+
+        # Most active newcomers first: free slots are taken, then the least active kept series is replaced
+        folded = []
+        for activity, name, point in sorted(newcomers, key=lambda item: (-item[0], item[1])):
+            if len(slots) < capacity:
+                challenges.pop(name, None)
+                slots.add(name)
+                kept.append(point)
+                continue
+
+            weakest = min(slots, key=lambda slot: (self.activity.get((device_serial, measurement, slot), 0.0), slot),
+                          default=None)
+            if weakest is None or activity <= ADMISSION_MARGIN * self.activity.get(
+                    (device_serial, measurement, weakest), 0.0):
+                challenges.pop(name, None)
+                folded.append(point)
+                continue
+
+            challenges[name] = challenges.get(name, 0) + 1
+            if challenges[name] < ADMISSION_CYCLES:
+                folded.append(point)
+                continue
+
+            # The replaced series is folded from this cycle on
+            del challenges[name]
+            slots.discard(weakest)
+            slots.add(name)
+            folded.extend(kept_point for kept_point in kept if kept_point.tags.get(series_tag) == weakest)
+            kept = [kept_point for kept_point in kept if kept_point.tags.get(series_tag) != weakest]
+            kept.append(point)
+
+        if not folded:
+            return kept
+        kept_series = len(kept)
+
+        fields = {}
+        for field in folded[0].fields:
+            values = [point.fields[field] for point in folded if field in point.fields]
+            fields[field] = FIELD_COMBINERS.get(field, combine)(values)
+        for field, derive in DERIVED_FIELDS.items():
+            if field in fields:
+                fields[field] = derive(fields)
+
+        logger.debug(f"Folding {len(folded)} {measurement} series of {device_serial} into '{OTHER_SERIES}'")
+        kept.append(
+            MetricPoint(
+                measurement=measurement,
+                tags={**folded[0].tags, series_tag: OTHER_SERIES},
+                fields=fields,
+                timestamp=folded[0].timestamp,
+            )
+        )
+        kept.append(
+            MetricPoint(
+                measurement="cardinality",
+                tags={"device_serial": device_serial, "measurement": measurement},
+                fields={
+                    "reported_series": len(points),
+                    "kept_series": kept_series,
+                    "folded_series": len(folded),
+                },
+                timestamp=folded[0].timestamp,
+            )
+        )
+
+        return kept
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Timeouts are learned from the latency of recent ADB calls to the same device
+DEFAULT_TIMEOUT = 30.0
+MIN_TIMEOUT = 5.0
+TIMEOUT_PERCENTILE = 0.95
+TIMEOUT_MULTIPLIER = 4.0
+LATENCY_WINDOW = 100
+MIN_LATENCY_SAMPLES = 10
+
+# Circuit breaker: a device is degraded after this many consecutive failures
+FAILURE_THRESHOLD = 3
+INITIAL_BACKOFF = 30.0
+MAX_BACKOFF = 600.0
+PROBE_TIMEOUT = 5.0
+
+# A shed stage's estimate is scaled by this, so the stage is tried again in a later cycle
+SHED_STAGE_DECAY = 0.5
+
+
+class DeviceHealth:
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.stage_durations: Dict[str, float] = {}
+        self.consecutive_failures = 0
+        self.degraded = False
+        self.backoff = INITIAL_BACKOFF
+        self.next_probe_at = 0.0
+
+    def latency_percentile(self, percentile: float) -> float:
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(percentile * len(ordered)))
+        return ordered[index]
+
+
+class DeviceHealthTracker:
+    def __init__(self):
+        self.devices: Dict[str, DeviceHealth] = {}
+
+    def _get(self, device_serial: str) -> DeviceHealth:
+        if device_serial not in self.devices:
+            self.devices[device_serial] = DeviceHealth()
+        return self.devices[device_serial]
+
+    def get_timeout(self, device_serial: str) -> float:
+        health = self._get(device_serial)
+        if health.degraded:
+            return PROBE_TIMEOUT
+        if len(health.latencies) < MIN_LATENCY_SAMPLES:
+            return DEFAULT_TIMEOUT
+
+        timeout = health.latency_percentile(TIMEOUT_PERCENTILE) * TIMEOUT_MULTIPLIER
+        return min(DEFAULT_TIMEOUT, max(MIN_TIMEOUT, timeout))
+
+    def record_success(self, device_serial: str, latency: Optional[float] = None):
+        health = self._get(device_serial)
+        if latency is not None:
+            health.latencies.append(latency)
+        health.consecutive_failures = 0
+
+        if health.degraded:
+            logger.info(f"Device {device_serial} recovered")
+            health.degraded = False
+            health.backoff = INITIAL_BACKOFF
+
+    def record_failure(self, device_serial: str):
+        health = self._get(device_serial)
+        health.consecutive_failures += 1
+
+        if health.degraded:
+            # Failed probe, wait longer before the next one. Calls that were still running when the
+            # device tripped the breaker fail before the probe is due and do not extend the backoff.
+            if time.monotonic() >= health.next_probe_at:
+                health.backoff = min(MAX_BACKOFF, health.backoff * 2)
+                health.next_probe_at = time.monotonic() + health.backoff
+        elif health.consecutive_failures >= FAILURE_THRESHOLD:
+            logger.warning(f"Device {device_serial} marked as degraded after "
+                           f"{health.consecutive_failures} consecutive failures, backing off {health.backoff:.0f}s")
+            health.degraded = True
+            health.next_probe_at = time.monotonic() + health.backoff
+
+    def is_degraded(self, device_serial: str) -> bool:
+        return self._get(device_serial).degraded
+
+    def is_probe_due(self, device_serial: str) -> bool:
+        return time.monotonic() >= self._get(device_serial).next_probe_at
+
+    def record_stage_duration(self, device_serial: str, stage: str, duration: float):
+        self._get(device_serial).stage_durations[stage] = duration
+
+    def record_stage_shed(self, device_serial: str, stage: str):
+        stage_durations = self._get(device_serial).stage_durations
+        if stage in stage_durations:
+            stage_durations[stage] *= SHED_STAGE_DECAY
+
+    def get_stage_estimate(self, device_serial: str, stage: str) -> float:
+        # Stages that never ran are assumed to fit, the first cycle calibrates them
+        return self._get(device_serial).stage_durations.get(stage, 0.0)
+
+
+# Global device health instance
+device_health = DeviceHealthTracker()
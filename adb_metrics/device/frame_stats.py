@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+PROFILE_DATA_MARKER = "---PROFILEDATA---"
+
+# Frames slower than this are janky on devices whose framestats have no FrameDeadline column (60 Hz)
+DEFAULT_FRAME_DEADLINE_NS = 16_666_667
+
+# Histogram bucket upper bounds in ms: 1 ms steps up to 50 ms, 5 ms up to 150 ms, 50 ms up to 1 s,
+# anything slower goes into an overflow bucket
+BUCKET_BOUNDS_MS: List[float] = (
+    [float(ms) for ms in range(1, 50)]
+    + [float(ms) for ms in range(50, 150, 5)]
+    + [float(ms) for ms in range(150, 1001, 50)]
+)
+
+
+class FrameHistogram:
+    """Fixed-size frame duration histogram, memory does not grow with the number of frames"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.total_frames = 0
+        self.janky_frames = 0
+        self.max_ms = 0.0
+
+    def add(self, duration_ms: float, janky: bool):
+        self.counts[bisect_left(BUCKET_BOUNDS_MS, duration_ms)] += 1
+        self.total_frames += 1
+        if janky:
+            self.janky_frames += 1
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def percentile(self, percentile: float) -> float:
+        """Upper bound of the bucket holding the given percentile, the slowest frame for the overflow bucket"""
+        target = percentile * self.total_frames
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if count and cumulative >= target:
+                return BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_fields(self) -> Dict[str, float]:
+        return {
+            "total_frames": self.total_frames,
+            "janky_frames": self.janky_frames,
+            "janky_percent": (self.janky_frames / self.total_frames) * 100,
+            "p50_ms": self.percentile(0.50),
+            "p90_ms": self.percentile(0.90),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms,
+        }
+
+
+class FramestatsParser:
+    """Incremental parser for `dumpsys gfxinfo <package> framestats`.
+
+    Lines are fed one at a time. Every PROFILEDATA section (one per window of the app) is folded into the
+    same histogram, so raw frame rows are never kept.
+    """
+
+    def __init__(self):
+        self.histogram = FrameHistogram()
+        self.in_profile_data = False
+        self.columns: Optional[Dict[str, int]] = None
+
+    def feed(self, line: str):
+        line = line.strip()
+        if line == PROFILE_DATA_MARKER:
+            self.in_profile_data = not self.in_profile_data
+            self.columns = None
+            return
+
+        if not self.in_profile_data or not line:
+            return
+
+        parts = line.split(',')
+        if self.columns is None:
+            # Column order differs between Android versions, the first row of each section is the header
+            self.columns = {name: index for index, name in enumerate(parts)}
+            return
+
+        self._add_frame(parts)
+
+    def _add_frame(self, parts: List[str]):
+        try:
+            # Frames with flags set (e.g. window layout changes) are not representative and are skipped
+            if int(parts[self.columns["Flags"]]) != 0:
+                return
+
+            intended_vsync = int(parts[self.columns["IntendedVsync"]])
+            frame_completed = int(parts[self.columns["FrameCompleted"]])
+            deadline = DEFAULT_FRAME_DEADLINE_NS
+            if "FrameDeadline" in self.columns:
+                frame_deadline = int(parts[self.columns["FrameDeadline"]])
+                if frame_deadline > intended_vsync:
+                    deadline = frame_deadline - intended_vsync
+        except (KeyError, IndexError, ValueError):
+            return
+
+        duration_ns = frame_completed - intended_vsync
+        if duration_ns <= 0:
+            return
+
+        self.histogram.add(duration_ns / 1_000_000, duration_ns > deadline)
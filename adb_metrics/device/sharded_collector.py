@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+import logging
+import multiprocessing
+import queue
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from adb_metrics.config.adb_config import adb_config
+from adb_metrics.device.adb_device_manager import ADBDeviceManager
+from adb_metrics.device.android_metrics_collector import MetricPoint
+from adb_metrics.device.cardinality_guard import CardinalityGuard
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Maximum number of worker batches merged into a single write
+MAX_BATCHES_PER_WRITE = 64
+
+PackedMetric = Tuple[str, Dict[str, str], Dict[str, float], int]
+
+
+def get_shard(device_serial: str, num_shards: int) -> int:
+    # crc32 is stable across processes and runs, unlike the salted built-in hash()
+    return zlib.crc32(device_serial.encode()) % num_shards
+
+
+def pack_metrics(metrics: List[MetricPoint]) -> List[PackedMetric]:
+    return [
+        (metric.measurement, metric.tags, metric.fields, (metric.timestamp - EPOCH) // timedelta(microseconds=1))
+        for metric in metrics
+    ]
+
+
+def unpack_metrics(packed: List[PackedMetric]) -> List[MetricPoint]:
+    return [
+        MetricPoint(measurement, tags, fields, EPOCH + timedelta(microseconds=timestamp_us))
+        for measurement, tags, fields, timestamp_us in packed
+    ]
+
+
+def _collection_worker(shard: int, app_patterns: Optional[List[str]], interval: int,
+                       adb_host: Optional[str], adb_port: Optional[int], guard: Optional[CardinalityGuard],
+                       frame_metrics: bool, assignments: multiprocessing.Queue, batches: multiprocessing.Queue):
+    # CLI overrides are not inherited when workers are spawned instead of forked
+    adb_config.update_config(host=adb_host, port=adb_port)
+    devices: List[str] = []
+
+    try:
+        while True:
+            cycle_start = time.monotonic()
+
+            if devices:
+                metrics = ADBDeviceManager.collect_from_devices(devices, app_patterns, cycle_start + interval, guard,
+                                                                frame_metrics)
+                if metrics:
+                    batches.put((shard, pack_metrics(metrics)))
+
+            # Wait for the next cycle, picking up new assignments in the meantime
+            while True:
+                remaining = cycle_start + interval - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    message = assignments.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if message is None:
+                    return
+                idle = not devices
+                devices = message
+                logger.info(f"Shard {shard} now owns {len(devices)} devices: {devices}")
+                if idle:
+                    break
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardedCollector:
+    """Collects from all devices with a pool of worker processes, each owning a stable shard of the device serials.
+
+    The parent process lists devices once per interval, pushes shard assignments to the workers when the set
+    of devices changes, and receives compact metric batches back, so a single writer can persist them.
+    """
+
+    def __init__(self, num_workers: int, app_patterns: Optional[List[str]], interval: int,
+                 guard: Optional[CardinalityGuard] = None, frame_metrics: bool = False):
+        self.num_workers = num_workers
+        self.app_patterns = app_patterns
+        self.interval = interval
+        # Each worker gets its own copy, devices never change shard so their history stays in one worker
+        self.guard = guard
+        self.frame_metrics = frame_metrics
+        self.batches = multiprocessing.Queue()
+        self.workers: List[Optional[multiprocessing.Process]] = [None] * num_workers
+        self.assignment_queues: List[Optional[multiprocessing.Queue]] = [None] * num_workers
+        self.assignments: List[List[str]] = [[] for _ in range(num_workers)]
+
+    def _start_worker(self, shard: int):
+        assignment_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_collection_worker,
+            args=(shard, self.app_patterns, self.interval, adb_config.host, adb_config.port, self.guard,
+                  self.frame_metrics, assignment_queue, self.batches),
+            name=f"adb-metrics-shard-{shard}",
+            daemon=True
+        )
+        process.start()
+
+        self.workers[shard] = process
+        self.assignment_queues[shard] = assignment_queue
+        if self.assignments[shard]:
+            assignment_queue.put(self.assignments[shard])
+
+    def start(self):
+        logger.info(f"Starting {self.num_workers} collection workers")
+        for shard in range(self.num_workers):
+            self._start_worker(shard)
+
+    def rebalance(self):
+        for shard, process in enumerate(self.workers):
+            if not process.is_alive():
+                logger.warning(f"Collection worker for shard {shard} exited with code {process.exitcode}, restarting")
+                self._start_worker(shard)
+
+        shards: List[List[str]] = [[] for _ in range(self.num_workers)]
+        for device_serial in ADBDeviceManager.get_connected_devices():
+            shards[get_shard(device_serial, self.num_workers)].append(device_serial)
+
+        for shard, devices in enumerate(shards):
+            if devices != self.assignments[shard]:
+                self.assignments[shard] = devices
+                self.assignment_queues[shard].put(devices)
+
+        if not any(shards):
+            logger.warning("No devices connected")
+
+    def collect(self) -> Iterator[List[MetricPoint]]:
+        """Yield metrics as workers report them, merging batches that arrive together"""
+        next_rebalance = 0.0
+        while True:
+            if time.monotonic() >= next_rebalance:
+                self.rebalance()
+                next_rebalance = time.monotonic() + self.interval
+
+            try:
+                _, packed = self.batches.get(timeout=max(0.1, next_rebalance - time.monotonic()))
+            except queue.Empty:
+                continue
+
+            for _ in range(MAX_BATCHES_PER_WRITE - 1):
+                try:
+                    _, more = self.batches.get_nowait()
+                except queue.Empty:
+                    break
+                packed.extend(more)
+
+            yield unpack_metrics(packed)
+
+    def stop(self):
+        for assignment_queue in self.assignment_queues:
+            if assignment_queue is not None:
+                assignment_queue.put(None)
+        for process in self.workers:
+            if process is not None:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
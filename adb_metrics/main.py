@@ -4,13 +4,25 @@ import argparse
 import logging
 import sys
 import time
-from typing import Optional, List
+from typing import Dict, Optional, List, TYPE_CHECKING, Union
 
 from adb_metrics.config.adb_config import adb_config
-from adb_metrics.config.config import config
-from adb_metrics.data.influxdb import InfluxDBPersistence, ConsolePrinter
+from adb_metrics.config.config import get_config
+from adb_metrics.data.console import ConsolePrinter
 from adb_metrics.device.adb_device_manager import ADBDeviceManager
-from adb_metrics.device.android_metrics_collector import AndroidMetricsCollector, MetricPoint
+from adb_metrics.device.android_metrics_collector import MetricPoint
+from adb_metrics.device.cardinality_guard import CardinalityGuard, FOLDABLE_MEASUREMENTS
+
+# InfluxDB, archive and multiprocessing support are only imported by the modes that use them,
+# keeping startup fast for devices, print and --adb-test
+if TYPE_CHECKING:
+    from adb_metrics.data.archive import ArchiveWriter
+    from adb_metrics.data.influxdb import InfluxDBPersistence
+
+    MetricsSink = Union[InfluxDBPersistence, ArchiveWriter]
+
+# Number of line protocol records sent per write when replaying an archive
+REPLAY_BATCH_SIZE = 10000
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,47 +31,138 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def collect_metrics(device_id: Optional[str], app_patterns: Optional[List[str]]) -> List[MetricPoint]:
+def collect_metrics(device_id: Optional[str], app_patterns: Optional[List[str]],
+                    deadline: Optional[float] = None, guard: Optional[CardinalityGuard] = None,
+                    frame_metrics: bool = False) -> List[MetricPoint]:
     if device_id:
-        collector = AndroidMetricsCollector(device_id)
-        metrics = collector.collect_all_metrics(app_patterns)
+        metrics = ADBDeviceManager.collect_from_devices([device_id], app_patterns, deadline, guard, frame_metrics)
     else:
-        metrics = ADBDeviceManager.collect_from_all_devices(app_patterns)
+        metrics = ADBDeviceManager.collect_from_all_devices(app_patterns, deadline, guard, frame_metrics)
 
     return metrics
 
 
-def collect_and_print(device_id: Optional[str], app_patterns: Optional[List[str]]):
-    ConsolePrinter.print_metrics(collect_metrics(device_id, app_patterns))
+def collect_and_print(device_id: Optional[str], app_patterns: Optional[List[str]],
+                      guard: Optional[CardinalityGuard] = None, frame_metrics: bool = False):
+    ConsolePrinter.print_metrics(collect_metrics(device_id, app_patterns, guard=guard, frame_metrics=frame_metrics))
 
 
-def collect_and_persist(device_id: Optional[str], app_patterns: Optional[List[str]], interval: int):
+def persist_metrics(persistence: "MetricsSink", metrics: List[MetricPoint]):
+    if metrics:
+        success = persistence.write_metrics(metrics)
+        if success:
+            logger.info(f"Collected and persisted {len(metrics)} metrics")
+        else:
+            logger.error("Failed to persist metrics")
+    else:
+        logger.warning("No metrics collected")
+
+
+def collect_and_persist(device_id: Optional[str], app_patterns: Optional[List[str]], interval: int,
+                        workers: int = 1, guard: Optional[CardinalityGuard] = None, frame_metrics: bool = False):
+    from adb_metrics.data.influxdb import InfluxDBPersistence
+
     try:
         persistence = InfluxDBPersistence()
     except Exception as e:
         logger.error(f"Failed to initialize InfluxDB connection: {e}")
         sys.exit(1)
 
+    run_collection(persistence, device_id, app_patterns, interval, workers, guard, frame_metrics)
+
+
+def collect_and_record(device_id: Optional[str], app_patterns: Optional[List[str]], interval: int,
+                       archive_path: str, workers: int = 1, guard: Optional[CardinalityGuard] = None,
+                       frame_metrics: bool = False):
+    from adb_metrics.data.archive import ArchiveWriter
+
+    try:
+        archive = ArchiveWriter(archive_path)
+    except Exception as e:
+        logger.error(f"Failed to open archive {archive_path}: {e}")
+        sys.exit(1)
+
+    run_collection(archive, device_id, app_patterns, interval, workers, guard, frame_metrics)
+
+
+def run_collection(persistence: "MetricsSink", device_id: Optional[str], app_patterns: Optional[List[str]],
+                   interval: int, workers: int = 1, guard: Optional[CardinalityGuard] = None,
+                   frame_metrics: bool = False):
+    if workers > 1 and device_id:
+        logger.warning("--workers is ignored when collecting from a single device")
+    elif workers > 1:
+        run_sharded_collection(persistence, app_patterns, interval, workers, guard, frame_metrics)
+        return
+
     try:
         logger.info(f"Starting continuous collection every {interval} seconds...")
-        logger.info(f"Configuration: {config}")
+        logger.info(f"Configuration: {get_config()}")
 
         while True:
-            metrics = collect_metrics(device_id, app_patterns)
+            # Collection that would run past the next cycle is shed, lowest priority first
+            cycle_start = time.monotonic()
+            metrics = collect_metrics(device_id, app_patterns, cycle_start + interval, guard, frame_metrics)
+            persist_metrics(persistence, metrics)
 
-            if metrics:
-                success = persistence.write_metrics(metrics)
-                if success:
-                    logger.info(f"Collected and persisted {len(metrics)} metrics")
-                else:
-                    logger.error("Failed to persist metrics")
-            else:
-                logger.warning("No metrics collected")
+            time.sleep(max(0.0, interval - (time.monotonic() - cycle_start)))
 
-            time.sleep(interval)
+    except KeyboardInterrupt:
+        logger.info("Stopping collection...")
+    finally:
+        persistence.close()
+
+
+def run_sharded_collection(persistence: "MetricsSink", app_patterns: Optional[List[str]],
+                           interval: int, workers: int, guard: Optional[CardinalityGuard] = None,
+                           frame_metrics: bool = False):
+    from adb_metrics.device.sharded_collector import ShardedCollector
+
+    # Workers only collect, this process is the single writer
+    collector = ShardedCollector(workers, app_patterns, interval, guard, frame_metrics)
+
+    try:
+        logger.info(f"Starting continuous collection every {interval} seconds with {workers} workers...")
+        logger.info(f"Configuration: {get_config()}")
+
+        collector.start()
+        for metrics in collector.collect():
+            persist_metrics(persistence, metrics)
 
     except KeyboardInterrupt:
         logger.info("Stopping collection...")
+    finally:
+        collector.stop()
+        persistence.close()
+
+
+def replay_archive(archive_path: str, summary: bool):
+    from adb_metrics.data.archive import ArchiveReader
+
+    reader = ArchiveReader(archive_path)
+    if summary:
+        ConsolePrinter.print_archive_summary(reader.summarize())
+        return
+
+    from adb_metrics.data.influxdb import InfluxDBPersistence
+
+    try:
+        persistence = InfluxDBPersistence()
+    except Exception as e:
+        logger.error(f"Failed to initialize InfluxDB connection: {e}")
+        sys.exit(1)
+
+    try:
+        start = time.monotonic()
+        total = 0
+        for records in reader.iter_line_protocol(REPLAY_BATCH_SIZE):
+            if not persistence.write_line_protocol(records):
+                logger.error(f"Replay stopped after {total} samples")
+                sys.exit(1)
+            total += len(records)
+
+        elapsed = time.monotonic() - start
+        logger.info(f"Replayed {total} samples from {archive_path} in {elapsed:.1f}s "
+                    f"({total / max(elapsed, 1e-6):.0f} samples/s)")
     finally:
         persistence.close()
 
@@ -94,15 +197,29 @@ def test_adb_connection() -> bool:
 
 def show_config():
     print("✅ Current Configuration:")
-    print(config)
+    print(get_config())
+
+
+def parse_series_budgets(values: Optional[List[str]]) -> Dict[str, int]:
+    budgets = {}
+    for value in values or []:
+        measurement, _, budget = value.partition("=")
+        if not measurement or not budget.isdigit() or int(budget) < 1:
+            raise ValueError(f"invalid series budget '{value}', expected MEASUREMENT=N with N >= 1")
+        if measurement not in FOLDABLE_MEASUREMENTS:
+            raise ValueError(f"no series budget for '{measurement}', expected one of: "
+                             f"{', '.join(FOLDABLE_MEASUREMENTS)}")
+        budgets[measurement] = int(budget)
+    return budgets
 
 
 def main():
     parser = argparse.ArgumentParser(description="Android Metrics Collector")
     parser.add_argument(
         "mode",
-        choices=["print", "persist", "devices", "config"],
-        help="Operation mode: print to console, persist to InfluxDB, list devices, or show config"
+        choices=["print", "persist", "record", "replay", "devices", "config"],
+        help="Operation mode: print to console, persist to InfluxDB, record to an archive file, "
+             "replay an archive into InfluxDB, list devices, or show config"
     )
     parser.add_argument(
         "--device-id",
@@ -117,7 +234,41 @@ def main():
         "--interval",
         type=int,
         default=30,
-        help="Collection interval in seconds for persist mode (default: 30)"
+        help="Collection interval in seconds for persist and record modes (default: 30)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes for persist and record modes, each collecting from a shard of the devices "
+             "(default: 1)"
+    )
+    parser.add_argument(
+        "--frame-metrics",
+        action="store_true",
+        help="Also collect frame timing (gfxinfo framestats) percentiles and janky frame counts for monitored apps"
+    )
+    parser.add_argument(
+        "--series-budget",
+        type=int,
+        help="Maximum number of series per device for each of the temperature, app_cpu, app_memory and app_frames "
+             "measurements, including an 'other' series the least active ones are folded into; the battery "
+             "sensor is kept on top of it (default: unlimited)"
+    )
+    parser.add_argument(
+        "--series-budget-for",
+        action="append",
+        metavar="MEASUREMENT=N",
+        help="Series budget for a single measurement, overriding --series-budget. Can be specified multiple times."
+    )
+    parser.add_argument(
+        "--archive",
+        help="Archive file written by record mode and read by replay mode"
+    )
+    parser.add_argument(
+        "--summary",
+        action="store_true",
+        help="In replay mode, print a per-series summary of the archive instead of writing it to InfluxDB"
     )
     parser.add_argument(
         "--adb-host",
@@ -145,14 +296,34 @@ def main():
         test_success = test_adb_connection()
         sys.exit(0 if test_success else 1)
 
+    if args.mode in ("record", "replay") and not args.archive:
+        parser.error(f"--archive is required for {args.mode} mode")
+
+    if args.series_budget is not None and args.series_budget < 1:
+        parser.error("--series-budget must be at least 1")
+    try:
+        series_budgets = parse_series_budgets(args.series_budget_for)
+    except ValueError as e:
+        parser.error(str(e))
+
+    guard = None
+    if args.series_budget is not None or series_budgets:
+        guard = CardinalityGuard(args.series_budget, series_budgets)
+
     if args.mode == "config":
         show_config()
     elif args.mode == "devices":
         list_devices()
     elif args.mode == "print":
-        collect_and_print(args.device_id, args.app_pattern)
+        collect_and_print(args.device_id, args.app_pattern, guard, args.frame_metrics)
     elif args.mode == "persist":
-        collect_and_persist(args.device_id, args.app_pattern, args.interval)
+        collect_and_persist(args.device_id, args.app_pattern, args.interval, args.workers, guard,
+                            args.frame_metrics)
+    elif args.mode == "record":
+        collect_and_record(args.device_id, args.app_pattern, args.interval, args.archive, args.workers, guard,
+                           args.frame_metrics)
+    elif args.mode == "replay":
+        replay_archive(args.archive, args.summary)
 
 
 if __name__ == "__main__":
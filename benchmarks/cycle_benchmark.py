@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""End-to-end collection cycle benchmark.
+
+Runs full collection cycles offline: ADB calls are answered from the recorded outputs in
+benchmarks/fixtures with an injected latency, and InfluxDB writes go to a local stub HTTP endpoint.
+Results are written as JSON and compared against a stored baseline, exiting with status 1 on a regression.
+
+Usage (from the repository root):
+    python benchmarks/cycle_benchmark.py --devices 20 --latency-ms 5 --output results.json
+    python benchmarks/cycle_benchmark.py --save-baseline          # store the current results as the baseline
+    python benchmarks/cycle_benchmark.py --baseline benchmarks/baseline.json --tolerance 0.2
+
+Timings depend on the machine, so no baseline is committed. Without --baseline, runs compare against
+benchmarks/baseline.json when it exists; with --baseline, a missing file is an error.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from adb_metrics.config.adb_config import adb_config, ADBCommandError  # noqa: E402
+from adb_metrics.data.archive import ArchiveWriter  # noqa: E402
+from adb_metrics.device.android_metrics_collector import MetricPoint  # noqa: E402
+from adb_metrics.main import collect_metrics  # noqa: E402
+
+FIXTURES_DIR = os.path.join(REPO_ROOT, "benchmarks", "fixtures")
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+# ADB command (without the device selection) -> recorded output, {package} is filled in from the command
+FIXTURES = [
+    (re.compile(r"^shell getprop "), "getprop.txt"),
+    (re.compile(r"^shell dumpsys battery$"), "dumpsys_battery.txt"),
+    (re.compile(r"^shell dumpsys thermal$"), "dumpsys_thermal.txt"),
+    (re.compile(r"^shell cat /proc/stat$"), "proc_stat.txt"),
+    (re.compile(r"^shell cat /proc/meminfo$"), "proc_meminfo.txt"),
+    (re.compile(r"^shell pm list packages$"), "pm_list_packages.txt"),
+    (re.compile(r"^shell ps \| grep (?P<package>\S+)$"), "ps.txt"),
+    (re.compile(r"^shell dumpsys meminfo (?P<package>\S+)$"), "dumpsys_meminfo_app.txt"),
+    (re.compile(r"^shell dumpsys cpuinfo$"), "dumpsys_cpuinfo.txt"),
+    (re.compile(r"^shell dumpsys gfxinfo (?P<package>\S+) framestats reset$"), "dumpsys_gfxinfo_framestats.txt"),
+]
+
+# Metric name -> whether a higher value is better, used to detect regressions
+METRICS = {
+    "cycle_seconds_median": False,
+    "cycle_seconds_p95": False,
+    "adb_invocations_per_device": False,
+    "points_per_cycle": True,
+    "peak_rss_mb": False,
+    "alloc_bytes_per_point": False,
+    "retained_bytes_per_point": False,
+    "retained_blocks_per_point": False,
+    "archive_write_points_per_second": True,
+    "influx_write_points_per_second": True,
+}
+
+
+class StubADB:
+    """Replaces the ADB calls of the global ADBConfig with recorded outputs"""
+
+    def __init__(self, num_devices: int, latency_ms: float, jitter_ms: float):
+        self.devices = [f"bench-{index:04d}" for index in range(num_devices)]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.invocations: Counter = Counter()
+        self.fixtures: Dict[str, str] = {}
+        for _, name in FIXTURES:
+            with open(os.path.join(FIXTURES_DIR, name)) as fixture:
+                self.fixtures[name] = fixture.read()
+
+    def install(self):
+        adb_config.run_adb_command = self.run_adb_command
+        adb_config.stream_adb_command = self.stream_adb_command
+
+    def _respond(self, command: str, device_serial: Optional[str]) -> Optional[str]:
+        self.invocations[device_serial] += 1
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        if command == "devices":
+            return "List of devices attached\n" + "".join(f"{serial}\tdevice\n" for serial in self.devices)
+
+        for pattern, name in FIXTURES:
+            match = pattern.match(command)
+            if match:
+                output = self.fixtures[name]
+                if "package" in match.groupdict():
+                    output = output.replace("{package}", match.group("package"))
+                return output
+
+        return None
+
+    def run_adb_command(self, command: str, device_serial: str = None, timeout: float = None) -> Optional[str]:
+        return self._respond(command, device_serial)
+
+    def stream_adb_command(self, command: str, device_serial: str = None, timeout: float = None) -> Iterator[str]:
+        output = self._respond(command, device_serial)
+        if output is None:
+            raise ADBCommandError(f"ADB command '{command}' failed")
+
+        # One line at a time like the real command, so the allocations measured are the collector's own
+        start = 0
+        while start < len(output):
+            end = output.find("\n", start)
+            if end == -1:
+                end = len(output)
+            yield output[start:end]
+            start = end + 1
+
+
+class StubInfluxHandler(BaseHTTPRequestHandler):
+    lines_received = 0
+
+    def do_GET(self):
+        # /ping and /health
+        self.send_response(204)
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            import gzip
+            body = gzip.decompress(body)
+        StubInfluxHandler.lines_received += sum(1 for line in body.splitlines() if line.strip())
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def run_cycles(stub: StubADB, args: argparse.Namespace) -> Dict[str, float]:
+    timings = []
+    points = 0
+    for _ in range(args.cycles):
+        start = time.perf_counter()
+        points += len(collect_metrics(None, args.app_pattern, frame_metrics=args.frame_metrics))
+        timings.append(time.perf_counter() - start)
+
+    invocations = sum(count for serial, count in stub.invocations.items() if serial)
+    return {
+        "cycle_seconds_median": statistics.median(timings),
+        "cycle_seconds_p95": sorted(timings)[min(len(timings) - 1, int(0.95 * len(timings)))],
+        "adb_invocations_per_device": invocations / (len(stub.devices) * args.cycles),
+        "points_per_cycle": points / args.cycles,
+    }
+
+
+def measure_allocations(args: argparse.Namespace) -> Dict[str, float]:
+    """Per point: the most memory a cycle had allocated at once, including temporary allocations while
+    parsing, and the memory still held by the points it returns"""
+    # A separate cycle, tracing slows down the timed ones
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start_traced, _ = tracemalloc.get_traced_memory()
+    metrics = collect_metrics(None, args.app_pattern, frame_metrics=args.frame_metrics)
+    _, peak_traced = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # The first snapshot is itself traced, it is not part of the cycle
+    ignore_tracemalloc = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    growth = [stat for stat in after.filter_traces(ignore_tracemalloc).compare_to(
+        before.filter_traces(ignore_tracemalloc), "lineno") if stat.size_diff > 0]
+
+    points = max(1, len(metrics))
+    return {
+        "alloc_bytes_per_point": (peak_traced - start_traced) / points,
+        "retained_bytes_per_point": sum(stat.size_diff for stat in growth) / points,
+        "retained_blocks_per_point": sum(stat.count_diff for stat in growth) / points,
+    }
+
+
+def collect_points(args: argparse.Namespace, count: int) -> List[MetricPoint]:
+    # One real cycle repeated at consecutive intervals, so the write measurements do not pay the ADB latency
+    cycle = collect_metrics(None, args.app_pattern, frame_metrics=args.frame_metrics)
+    metrics = []
+    repeat = 0
+    while cycle and len(metrics) < count:
+        offset = timedelta(seconds=30 * repeat)
+        metrics.extend(MetricPoint(point.measurement, point.tags, point.fields, point.timestamp + offset)
+                       for point in cycle)
+        repeat += 1
+    return metrics[:count]
+
+
+def measure_archive_writes(metrics: List[MetricPoint]) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ArchiveWriter(os.path.join(directory, "bench.adbm"))
+        start = time.perf_counter()
+        archive.write_metrics(metrics)
+        archive.close()
+        elapsed = time.perf_counter() - start
+    return {"archive_write_points_per_second": len(metrics) / elapsed}
+
+
+def measure_influx_writes(metrics: List[MetricPoint], batch_size: int) -> Dict[str, float]:
+    from adb_metrics.data.influxdb import InfluxDBPersistence
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubInfluxHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        persistence = InfluxDBPersistence({
+            "url": f"http://127.0.0.1:{server.server_address[1]}",
+            "token": "benchmark",
+            "org": "benchmark",
+            "bucket": "benchmark",
+        })
+        StubInfluxHandler.lines_received = 0
+        failed = 0
+        start = time.perf_counter()
+        for offset in range(0, len(metrics), batch_size):
+            if not persistence.write_metrics(metrics[offset:offset + batch_size]):
+                failed += 1
+        elapsed = time.perf_counter() - start
+        persistence.close()
+    finally:
+        server.shutdown()
+
+    # A broken write path must not show up as a speedup
+    if failed or StubInfluxHandler.lines_received != len(metrics):
+        sys.exit(f"InfluxDB writes failed: {failed} failed batches, {StubInfluxHandler.lines_received} of "
+                 f"{len(metrics)} points received")
+
+    return {"influx_write_points_per_second": len(metrics) / elapsed}
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        if name not in results or name not in baseline or not baseline[name]:
+            continue
+        change = (results[name] - baseline[name]) / baseline[name]
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{name}: {baseline[name]:.4g} -> {results[name]:.4g} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end collection cycle benchmark")
+    parser.add_argument("--devices", type=int, default=10, help="Number of simulated devices (default: 10)")
+    parser.add_argument("--cycles", type=int, default=5, help="Number of timed collection cycles (default: 5)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected latency per ADB call (default: 0)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra latency per ADB call (default: 0)")
+    parser.add_argument("--app-pattern", action="append", default=None,
+                        help="App pattern(s) to collect (default: 'com.example.*')")
+    parser.add_argument("--frame-metrics", action="store_true", help="Include frame timing collection")
+    parser.add_argument("--write-points", type=int, default=50000,
+                        help="Number of points for the write throughput measurements (default: 50000)")
+    parser.add_argument("--write-batch-size", type=int, default=5000,
+                        help="Points per InfluxDB write (default: 5000)")
+    parser.add_argument("--no-influx", action="store_true",
+                        help="Skip the InfluxDB write measurement (e.g. when influxdb-client is not installed)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline",
+                        help="Baseline JSON to compare against, an error if it does not exist "
+                             "(default: benchmarks/baseline.json if it exists)")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative change before a metric counts as a regression (default: 0.2)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    args = parser.parse_args()
+    args.app_pattern = args.app_pattern or ["com.example.*"]
+
+    # An explicit baseline must exist, otherwise a regression check asked for would silently not run
+    if args.baseline and not args.save_baseline and not os.path.exists(args.baseline):
+        parser.error(f"baseline {args.baseline} does not exist, create it with --save-baseline")
+    baseline_path = args.baseline or DEFAULT_BASELINE
+
+    logging.getLogger().setLevel(logging.ERROR)
+    random.seed(0)
+
+    stub = StubADB(args.devices, args.latency_ms, args.jitter_ms)
+    stub.install()
+
+    results = run_cycles(stub, args)
+    # Taken before the write measurements build their points, so it reflects the collection cycles
+    results["peak_rss_mb"] = peak_rss_mb()
+    results.update(measure_allocations(args))
+
+    metrics = collect_points(args, args.write_points)
+    results.update(measure_archive_writes(metrics))
+    if not args.no_influx:
+        results.update(measure_influx_writes(metrics, args.write_batch_size))
+
+    report = {
+        "config": {
+            "devices": args.devices,
+            "cycles": args.cycles,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "app_patterns": args.app_pattern,
+            "frame_metrics": args.frame_metrics,
+            "python": sys.version.split()[0],
+        },
+        "results": results,
+    }
+
+    for name, value in results.items():
+        print(f"{name:>34}: {value:.4g}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if args.save_baseline:
+        with open(baseline_path, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print(f"\nSaved baseline to {baseline_path}")
+        return
+
+    if not os.path.exists(baseline_path):
+        print(f"\nNo baseline at {baseline_path}, run with --save-baseline to create one")
+        return
+
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline["config"] != report["config"]:
+        print("\nWarning: baseline was recorded with a different configuration")
+
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) against {baseline_path}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+    print(f"\n✅ No regressions against {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
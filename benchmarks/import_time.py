@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Measure CLI startup time.
+
+Runs each scenario in a fresh interpreter several times and reports wall time, then lists the
+slowest imports of the CLI entry point as reported by ``python -X importtime``.
+
+Usage (from the repository root):
+    python benchmarks/import_time.py [--runs 20] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS: Dict[str, List[str]] = {
+    # What devices, print and --adb-test pay before doing any work
+    "cli": ["-m", "adb_metrics.main", "--help"],
+    # What persist mode pays on top of that
+    "persist": ["-c", "import adb_metrics.main, adb_metrics.data.influxdb"],
+}
+
+
+def time_scenario(args: List[str], runs: int) -> List[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=REPO_ROOT, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=False)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def slowest_imports(args: List[str], top: int) -> List[tuple]:
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=REPO_ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+
+    imports = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), name.rstrip()))
+
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup benchmark")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per scenario (default: 20)")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to list (default: 15)")
+    args = parser.parse_args()
+
+    baseline = time_scenario(["-c", "pass"], args.runs)
+    print(f"Interpreter startup: median {statistics.median(baseline) * 1000:.1f} ms")
+
+    for name, scenario_args in SCENARIOS.items():
+        timings = time_scenario(scenario_args, args.runs)
+        median = statistics.median(timings)
+        print(f"{name:>12}: median {median * 1000:.1f} ms, min {min(timings) * 1000:.1f} ms, "
+              f"{(median - statistics.median(baseline)) * 1000:.1f} ms over interpreter startup")
+
+    print("\nSlowest imports for 'cli' (cumulative):")
+    for cumulative_us, name in slowest_imports(SCENARIOS["cli"], args.top):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
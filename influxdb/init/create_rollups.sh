@@ -0,0 +1,59 @@
+#!/bin/bash
+
+# Creates the hourly and daily rollup buckets and the downsampling tasks that fill them.
+# Runs automatically on the first start of the InfluxDB container (docker-entrypoint-initdb.d).
+# For an existing instance, run it inside the container:
+#   docker exec influx /docker-entrypoint-initdb.d/create_rollups.sh
+
+set -e
+
+INFLUXDB_ORG="${INFLUXDB_ORG:-$DOCKER_INFLUXDB_INIT_ORG}"
+INFLUXDB_BUCKET="${INFLUXDB_BUCKET:-$DOCKER_INFLUXDB_INIT_BUCKET}"
+INFLUXDB_TOKEN="${INFLUXDB_ADMIN_TOKEN:-${DOCKER_INFLUXDB_INIT_ADMIN_TOKEN:-$INFLUXDB_TOKEN}}"
+TASKS_DIR="${TASKS_DIR:-/opt/adb_metrics/tasks}"
+
+# Ensure required variables are present
+if [ -z "$INFLUXDB_ORG" ] || [ -z "$INFLUXDB_BUCKET" ] || [ -z "$INFLUXDB_TOKEN" ]; then
+    echo "Error: INFLUXDB_ORG, INFLUXDB_BUCKET and INFLUXDB_ADMIN_TOKEN must be set."
+    exit 1
+fi
+
+# Function to create a bucket unless it already exists
+create_bucket() {
+    local name=$1
+    local retention=$2
+
+    if influx bucket find --org "$INFLUXDB_ORG" --token "$INFLUXDB_TOKEN" --name "$name" > /dev/null 2>&1; then
+        echo "Bucket $name already exists"
+    else
+        echo "Creating bucket $name (retention: $retention)"
+        influx bucket create --org "$INFLUXDB_ORG" --token "$INFLUXDB_TOKEN" --name "$name" --retention "$retention"
+    fi
+}
+
+# Function to create a task from a template unless a task with the same name already exists
+create_task() {
+    local file=$1
+    local name
+    name=$(grep -oE 'name: "[^"]+"' "$file" | head -n 1 | cut -d '"' -f2)
+
+    if influx task list --org "$INFLUXDB_ORG" --token "$INFLUXDB_TOKEN" | grep -q "$name"; then
+        echo "Task $name already exists"
+    else
+        echo "Creating task $name"
+        local rendered
+        rendered=$(mktemp)
+        sed -e "s|\${{INFLUXDB_ORG}}|$INFLUXDB_ORG|g" \
+            -e "s|\${{INFLUXDB_BUCKET}}|$INFLUXDB_BUCKET|g" "$file" > "$rendered"
+        influx task create --org "$INFLUXDB_ORG" --token "$INFLUXDB_TOKEN" --file "$rendered"
+        rm -f "$rendered"
+    fi
+}
+
+create_bucket "${INFLUXDB_BUCKET}_1h" 400d
+create_bucket "${INFLUXDB_BUCKET}_1d" 0
+
+create_task "$TASKS_DIR/rollup_1h.flux"
+create_task "$TASKS_DIR/rollup_1d.flux"
+
+echo "Rollup configuration complete!"